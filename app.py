@@ -1,11 +1,27 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import requests
+import orjson
+import diskcache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import folium
-from streamlit_folium import st_folium
+from folium.plugins import FastMarkerCluster
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from pyproj import Transformer
 import time
 import logging
+import gc
+import html
+import re
+import functools
+import threading
+import uuid
+from types import MappingProxyType
+from string import Template
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 
 # ==============================
 # API KEYS
@@ -13,47 +29,242 @@ import logging
 GOOGLE_API_KEY = st.secrets["google_api_key"]
 TOMTOM_API_KEY = st.secrets.get("tomtom_api_key", "")
 
+# Batch runs allocate many small dicts; collect gen-0 less eagerly
+gc.set_threshold(50000, 10, 10)
+
+# ==============================
+# DATA MODEL
+# ==============================
+
+# Competitor stations are kept column-wise in a DataFrame with these columns
+EV_STATION_COLUMNS = [
+    "name", "rating", "address", "photo_url",
+    "types", "place_id", "latitude", "longitude"
+]
+
+def empty_ev_stations():
+    """Return an empty competitor-station frame with the standard columns"""
+    return pd.DataFrame(columns=EV_STATION_COLUMNS)
+
+@dataclass(slots=True)
+class SiteResult:
+    """Analysis results for a single proposed site"""
+    latitude: float
+    longitude: float
+    easting: int | None = None
+    northing: int | None = None
+    postcode: str = "N/A"
+    ward: str = "N/A"
+    district: str = "N/A"
+    street: str = "N/A"
+    street_number: str = "N/A"
+    neighborhood: str = "N/A"
+    city: str = "N/A"
+    county: str = "N/A"
+    region: str = "N/A"
+    country: str = "N/A"
+    formatted_address: str = "N/A"
+    fast_chargers: int = 0
+    rapid_chargers: int = 0
+    ultra_chargers: int = 0
+    required_kva: float = 0
+    traffic_speed: float | None = None
+    traffic_freeflow: float | None = None
+    traffic_congestion: str = "N/A"
+    amenities: str = "N/A"
+    snapped_road_name: str = "Unknown"
+    snapped_road_type: str = "Unknown"
+    nearest_road_name: str = "Unknown"
+    nearest_road_type: str = "Unknown"
+    place_id: str | None = None
+    competitor_ev_count: int = 0
+    competitor_ev_names: str = "None"
+    ev_stations_details: pd.DataFrame = field(default_factory=empty_ev_stations)
+    competitor_radius: int | None = None
+    amenities_radius: int | None = None
+    error: str | None = None
+
+# ==============================
+# HTTP HELPERS
+# ==============================
+
+HTTP_MAX_WORKERS = 16
+SITE_STAGE_WORKERS = 12
+BATCH_SITE_WORKERS = 4
+GOOGLE_MAX_CONCURRENT_REQUESTS = 10
+GOOGLE_MAX_REQUESTS_PER_SECOND = 50
+PLACE_DETAILS_URL = "https://maps.googleapis.com/maps/api/place/details/json"
+
+@st.cache_resource
+def get_http_session():
+    """Get a shared HTTP session that keeps connections to the APIs alive"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=64,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=[429, 500, 502, 503, 504],
+            raise_on_status=False
+        )
+    )
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def get_http_executor():
+    """Get the shared thread pool used to fan out API requests"""
+    return ThreadPoolExecutor(max_workers=HTTP_MAX_WORKERS, thread_name_prefix="http")
+
+@st.cache_resource
+def get_site_executor():
+    """Get the shared thread pool that runs the per-site lookup stages
+    
+    Stage tasks wait on requests in the HTTP pool, so the two must stay separate.
+    """
+    return ThreadPoolExecutor(max_workers=SITE_STAGE_WORKERS, thread_name_prefix="site")
+
+@st.cache_resource
+def get_google_limiter():
+    """Get the semaphore capping in-flight Google Maps requests"""
+    return threading.Semaphore(GOOGLE_MAX_CONCURRENT_REQUESTS)
+
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` requests per second on average"""
+    
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Take a token, waiting only if the bucket is empty"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+@st.cache_resource
+def get_google_rate_limiter():
+    """Get the token bucket keeping Google Maps requests under the per-second quota"""
+    return RateLimiter(GOOGLE_MAX_REQUESTS_PER_SECOND)
+
+def submit_with_context(executor, fn, *args, **kwargs):
+    """Submit a call to an executor so st.* calls made by the worker reach this session"""
+    ctx = get_script_run_ctx()
+    
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args, **kwargs)
+    
+    return executor.submit(run)
+
+def parse_json(response):
+    """Decode a JSON response body with orjson, which is much faster than response.json()"""
+    return orjson.loads(response.content)
+
+def google_json(response):
+    """Decode a Google Maps response, raising if the request failed
+    
+    ZERO_RESULTS is a valid answer; any other non-OK status (quota, denied, ...) is an error.
+    """
+    response.raise_for_status()
+    data = parse_json(response)
+    status = data.get("status", "OK")
+    if status not in ("OK", "ZERO_RESULTS"):
+        raise RuntimeError(f"Google API status {status}")
+    return data
+
+def google_get(url, params):
+    """GET a Google Maps endpoint without exceeding the request rate or concurrency caps"""
+    get_google_rate_limiter().acquire()
+    with get_google_limiter():
+        return get_http_session().get(url, params=params, timeout=10)
+
+# Lookups of places, roads and postcodes are kept on disk for a week, so restarts
+# and other app processes reuse them without letting competitor data go stale.
+# The in-memory st.cache_data layer in front only holds them for an hour, so a
+# result is never served much past its on-disk expiry.
+LOOKUP_CACHE_DIR = ".geo_cache"
+LOOKUP_CACHE_TTL = 7 * 24 * 60 * 60
+LOOKUP_MEMORY_TTL = 60 * 60
+
+@st.cache_resource
+def get_lookup_cache():
+    """Get the on-disk cache of API lookups, shared by every session and process"""
+    return diskcache.Cache(LOOKUP_CACHE_DIR)
+
+def disk_cached(fn):
+    """Keep fn's results in the lookup cache for LOOKUP_CACHE_TTL seconds
+    
+    Exceptions are not cached, so a failed lookup is retried on the next call.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args):
+        cache = get_lookup_cache()
+        key = (fn.__name__, *args)
+        result = cache.get(key, default=diskcache.ENOVAL)
+        if result is diskcache.ENOVAL:
+            result = fn(*args)
+            cache.set(key, result, expire=LOOKUP_CACHE_TTL)
+        return result
+    return wrapper
+
 # ==============================
 # UTILITY FUNCTIONS
 # ==============================
 
+# Common EV charging brands, matched as substrings of station names (read-only)
+EV_BRANDS = MappingProxyType({
+    'tesla': 'Tesla',
+    'supercharger': 'Tesla',
+    'chargepoint': 'ChargePoint',
+    'ionity': 'Ionity',
+    'pod point': 'Pod Point',
+    'podpoint': 'Pod Point',
+    'ecotricity': 'Ecotricity',
+    'bp pulse': 'BP Pulse',
+    'bp': 'BP Pulse',
+    'shell': 'Shell Recharge',
+    'gridserve': 'Gridserve',
+    'instavolt': 'InstaVolt',
+    'osprey': 'Osprey Charging',
+    'charge your car': 'Charge Your Car',
+    'rolec': 'Rolec',
+    'chargemaster': 'Chargemaster',
+    'polar': 'Polar Network',
+    'source london': 'Source London',
+    'ev-box': 'EVBox',
+    'fastned': 'Fastned',
+    'mer': 'MER',
+    'newmotion': 'NewMotion'
+})
+
+# One lookahead alternation finds every (possibly overlapping) brand key in a
+# single scan of the name; the earliest key in EV_BRANDS wins, as before
+_BRAND_PATTERN = re.compile("(?=(" + "|".join(re.escape(brand_key) for brand_key in EV_BRANDS) + "))")
+_BRAND_PRIORITY = {brand_key: i for i, brand_key in enumerate(EV_BRANDS)}
+
 def extract_brand_name(station_name):
     """Extract brand name from station name"""
     if not station_name or station_name == "Unknown":
         return "Unknown"
     
-    # Common EV charging brands
-    brands = {
-        'tesla': 'Tesla',
-        'supercharger': 'Tesla',
-        'chargepoint': 'ChargePoint',
-        'ionity': 'Ionity',
-        'pod point': 'Pod Point',
-        'podpoint': 'Pod Point',
-        'ecotricity': 'Ecotricity',
-        'bp pulse': 'BP Pulse',
-        'bp': 'BP Pulse',
-        'shell': 'Shell Recharge',
-        'gridserve': 'Gridserve',
-        'instavolt': 'InstaVolt',
-        'osprey': 'Osprey Charging',
-        'charge your car': 'Charge Your Car',
-        'rolec': 'Rolec',
-        'chargemaster': 'Chargemaster',
-        'polar': 'Polar Network',
-        'source london': 'Source London',
-        'ev-box': 'EVBox',
-        'fastned': 'Fastned',
-        'mer': 'MER',
-        'newmotion': 'NewMotion'
-    }
-    
     name_lower = station_name.lower()
     
     # Check for brand matches
-    for brand_key, brand_name in brands.items():
-        if brand_key in name_lower:
-            return brand_name
+    matches = [m.group(1) for m in _BRAND_PATTERN.finditer(name_lower)]
+    if matches:
+        return EV_BRANDS[min(matches, key=_BRAND_PRIORITY.__getitem__)]
     
     # If no known brand found, try to extract first word(s)
     words = station_name.split()
@@ -64,8 +275,20 @@ def extract_brand_name(station_name):
     
     return "Other"
 
+@st.cache_data(show_spinner=False)
+def compute_market_share(station_names):
+    """Count competitor stations per brand, largest first, from a tuple of station names"""
+    # Classify each distinct name once, then total the stations per brand
+    return (
+        pd.Series(station_names, dtype=object).fillna('Unknown')
+        .value_counts()
+        .groupby(extract_brand_name).sum()
+        .sort_values(ascending=False)
+    )
+
+@st.cache_data(show_spinner=False)
 def create_pie_chart_data(brands_dict):
-    """Create pie chart data for market share analysis"""
+    """Create pie chart data for market share analysis (cached on the brand counts)"""
     if not brands_dict:
         return None
     
@@ -110,175 +333,192 @@ def create_pie_chart_data(brands_dict):
         st.warning(f"Could not create pie chart: {e}")
         return None
 
-@st.cache_data
+# Radius searches from points ~50 m apart return the same places, so they
+# are issued from a snapped grid point to share cache entries
+SEARCH_GRID_DEG = 5e-4
+
+def snap_to_search_grid(value):
+    """Snap a coordinate to the shared grid used for radius searches"""
+    return round(round(value / SEARCH_GRID_DEG) * SEARCH_GRID_DEG, 6)
+
+@st.cache_data(ttl=LOOKUP_MEMORY_TTL)
+@disk_cached
+def fetch_postcode_info(lat, lon):
+    """Get postcode, ward and district from postcodes.io, raising if the lookup fails"""
+    r = get_http_session().get(f"https://api.postcodes.io/postcodes?lon={lon}&lat={lat}", timeout=10)
+    data = parse_json(r)
+    if data.get("status") != 200:
+        raise RuntimeError(f"postcodes.io status {data.get('status')}")
+    if data["result"]:
+        res = data["result"][0]
+        return res.get("postcode","N/A"), res.get("admin_ward","N/A"), res.get("admin_district","N/A")
+    return "N/A","N/A","N/A"
+
 def get_postcode_info(lat, lon):
     """Get postcode information using postcodes.io API"""
     try:
-        r = requests.get(f"https://api.postcodes.io/postcodes?lon={lon}&lat={lat}", timeout=10)
-        data = r.json()
-        if data.get("status") == 200 and data["result"]:
-            res = data["result"][0]
-            return res.get("postcode","N/A"), res.get("admin_ward","N/A"), res.get("admin_district","N/A")
+        return fetch_postcode_info(lat, lon)
     except Exception as e:
         st.warning(f"Postcode API error: {e}")
     return "N/A","N/A","N/A"
 
-@st.cache_data
+@st.cache_data(ttl=LOOKUP_MEMORY_TTL)
+@disk_cached
+def fetch_geocode_details(lat, lon):
+    """Get detailed geocoding information from Google Maps, raising if the lookup fails"""
+    r = google_get("https://maps.googleapis.com/maps/api/geocode/json", 
+                   params={"latlng": f"{lat},{lon}", "key": GOOGLE_API_KEY})
+    data = google_json(r)
+    details = {}
+    if data.get("results"):
+        comps = data["results"][0]["address_components"]
+        for c in comps:
+            types = c.get("types",[])
+            if "route" in types: details["street"]=c["long_name"]
+            if "street_number" in types: details["street_number"]=c["long_name"]
+            if "neighborhood" in types: details["neighborhood"]=c["long_name"]
+            if "locality" in types: details["city"]=c["long_name"]
+            if "administrative_area_level_2" in types: details["county"]=c["long_name"]
+            if "administrative_area_level_1" in types: details["region"]=c["long_name"]
+            if "postal_code" in types: details["postcode"]=c["long_name"]
+            if "country" in types: details["country"]=c["long_name"]
+        details["formatted_address"]=data["results"][0].get("formatted_address")
+    return details
+
 def get_geocode_details(lat, lon):
     """Get detailed geocoding information from Google Maps"""
     try:
-        r = requests.get("https://maps.googleapis.com/maps/api/geocode/json", 
-                         params={"latlng": f"{lat},{lon}", "key": GOOGLE_API_KEY}, timeout=10)
-        data = r.json()
-        if data.get("status")=="OK" and data.get("results"):
-            comps = data["results"][0]["address_components"]
-            details = {}
-            for c in comps:
-                types = c.get("types",[])
-                if "route" in types: details["street"]=c["long_name"]
-                if "street_number" in types: details["street_number"]=c["long_name"]
-                if "neighborhood" in types: details["neighborhood"]=c["long_name"]
-                if "locality" in types: details["city"]=c["long_name"]
-                if "administrative_area_level_2" in types: details["county"]=c["long_name"]
-                if "administrative_area_level_1" in types: details["region"]=c["long_name"]
-                if "postal_code" in types: details["postcode"]=c["long_name"]
-                if "country" in types: details["country"]=c["long_name"]
-            details["formatted_address"]=data["results"][0].get("formatted_address")
-            return details
+        return fetch_geocode_details(lat, lon)
     except Exception as e:
         st.warning(f"Geocoding API error: {e}")
     return {}
 
-@st.cache_data
-def get_ev_charging_stations(lat, lon, radius=1000):
-    """Get EV charging stations specifically"""
-    ev_stations = []
+# Place names containing any of these (case-insensitive) count as EV charging stations
+_EV_KEYWORD_SEARCH = re.compile(
+    "electric|ev|charging|tesla|chargepoint|ionity|pod point|ecotricity", re.IGNORECASE
+).search
+
+@st.cache_data(ttl=LOOKUP_MEMORY_TTL)
+@disk_cached
+def fetch_ev_charging_stations(lat, lon, radius=1000):
+    """Get EV charging stations, one row per station, raising if any search fails"""
+    search_terms = [
+        "electric vehicle charging station",
+        "EV charging",
+        "Tesla Supercharger",
+        "ChargePoint",
+        "Ionity"
+    ]
     
-    try:
-        search_terms = [
-            "electric vehicle charging station",
-            "EV charging",
-            "Tesla Supercharger",
-            "ChargePoint",
-            "Ionity"
-        ]
-        
-        url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-        all_results = []
-        
-        # Method 1: Type-based search
-        type_params = {
+    url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+    executor = get_http_executor()
+    all_results = []
+    
+    # Method 1: Type-based search
+    searches = [{
+        "location": f"{lat},{lon}",
+        "radius": radius,
+        "type": "gas_station",
+        "keyword": "electric vehicle charging",
+        "key": GOOGLE_API_KEY
+    }]
+    
+    # Method 2: Keyword searches
+    for term in search_terms:
+        searches.append({
             "location": f"{lat},{lon}",
             "radius": radius,
-            "type": "gas_station",
-            "keyword": "electric vehicle charging",
+            "keyword": term,
             "key": GOOGLE_API_KEY
-        }
-        
-        response = requests.get(url, params=type_params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("status") == "OK":
-                all_results.extend(data.get("results", []))
-        
-        time.sleep(0.1)
+        })
+    
+    search_futures = [submit_with_context(executor, google_get, url, params) for params in searches]
+    for future in search_futures:
+        all_results.extend(google_json(future.result()).get("results", []))
+    
+    # Remove duplicates based on place_id first so each place is filtered only once
+    seen_ids = set()
+    first_hits = []
+    for place in all_results:
+        place_id = place.get("place_id")
+        if place_id and place_id not in seen_ids:
+            seen_ids.add(place_id)
+            first_hits.append(place)
+    
+    # nearbysearch already carries name, rating, vicinity, types, geometry and photos for each place
+    unique_places = {}
+    for place in first_hits:
+        place_id = place["place_id"]
+        types = place.get("types", [])
         
-        # Method 2: Keyword searches
-        for term in search_terms:
-            keyword_params = {
-                "location": f"{lat},{lon}",
-                "radius": radius,
-                "keyword": term,
-                "key": GOOGLE_API_KEY
-            }
+        if _EV_KEYWORD_SEARCH(place.get("name", "")) or "electric_vehicle_charging_station" in types:
+            geometry = place.get("geometry", {})
+            location = geometry.get("location", {})
             
-            response = requests.get(url, params=keyword_params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("status") == "OK":
-                    all_results.extend(data.get("results", []))
+            photo_url = None
+            photos = place.get("photos", [])
+            if photos:
+                photo_reference = photos[0].get("photo_reference")
+                if photo_reference:
+                    photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=400&photoreference={photo_reference}&key={GOOGLE_API_KEY}"
             
-            time.sleep(0.1)
-        
-        # Remove duplicates based on place_id
-        unique_places = {}
-        for place in all_results:
-            place_id = place.get("place_id")
-            if place_id and place_id not in unique_places:
-                name = place.get("name", "").lower()
-                types = place.get("types", [])
-                
-                ev_keywords = ["electric", "ev", "charging", "tesla", "chargepoint", "ionity", "pod point", "ecotricity"]
-                
-                if any(keyword in name for keyword in ev_keywords) or "electric_vehicle_charging_station" in types:
-                    geometry = place.get("geometry", {})
-                    location = geometry.get("location", {})
-                    
-                    unique_places[place_id] = {
-                        "place_id": place_id,
-                        "name": place.get("name", "Unknown"),
-                        "latitude": location.get("lat"),
-                        "longitude": location.get("lng"),
-                        "geometry": geometry
-                    }
-        
-        # Get detailed information for each EV station
-        for place_id, basic_info in unique_places.items():
-            try:
-                details_url = "https://maps.googleapis.com/maps/api/place/details/json"
-                details_params = {
-                    "place_id": place_id,
-                    "fields": "name,rating,formatted_address,photos,types,geometry,opening_hours,formatted_phone_number",
-                    "key": GOOGLE_API_KEY
-                }
-                
-                details_response = requests.get(details_url, params=details_params, timeout=10)
-                if details_response.status_code == 200:
-                    details_data = details_response.json()
-                    if details_data.get("status") == "OK":
-                        result = details_data.get("result", {})
-                        
-                        photo_url = None
-                        photos = result.get("photos", [])
-                        if photos:
-                            photo_reference = photos[0].get("photo_reference")
-                            if photo_reference:
-                                photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=400&photoreference={photo_reference}&key={GOOGLE_API_KEY}"
-                        
-                        geometry = result.get("geometry", basic_info.get("geometry", {}))
-                        location = geometry.get("location", {})
-                        
-                        ev_station = {
-                            "name": result.get("name", basic_info.get("name", "Unknown")),
-                            "rating": result.get("rating", "N/A"),
-                            "address": result.get("formatted_address", "N/A"),
-                            "photo_url": photo_url,
-                            "phone": result.get("formatted_phone_number", "N/A"),
-                            "types": result.get("types", []),
-                            "place_id": place_id,
-                            "latitude": location.get("lat", basic_info.get("latitude")),
-                            "longitude": location.get("lng", basic_info.get("longitude")),
-                            "geometry": geometry
-                        }
-                        
-                        if ev_station["latitude"] and ev_station["longitude"]:
-                            ev_stations.append(ev_station)
-                
-                time.sleep(0.1)
-                
-            except Exception as e:
-                st.warning(f"Error getting EV station details: {e}")
-                if basic_info.get("latitude") and basic_info.get("longitude"):
-                    ev_stations.append(basic_info)
+            unique_places[place_id] = {
+                "name": place.get("name", "Unknown"),
+                "rating": place.get("rating", "N/A"),
+                "address": place.get("vicinity", "N/A"),
+                "photo_url": photo_url,
+                "types": types,
+                "place_id": place_id,
+                "latitude": location.get("lat"),
+                "longitude": location.get("lng")
+            }
     
+    # Contact details need a Place Details call each, so they are fetched on demand
+    # with fetch_station_contact rather than for every station here
+    stations = pd.DataFrame.from_records(list(unique_places.values()), columns=EV_STATION_COLUMNS)
+    return stations[
+        stations["latitude"].notna() & stations["longitude"].notna()
+    ].reset_index(drop=True)
+
+def get_ev_charging_stations(lat, lon, radius=1000):
+    """Get EV charging stations specifically, one row per station"""
+    try:
+        return fetch_ev_charging_stations(lat, lon, radius)
     except Exception as e:
         st.warning(f"Error searching for EV stations: {e}")
-    
-    return ev_stations
+    return empty_ev_stations()
 
-@st.cache_data
-def get_nearby_amenities(lat, lon, radius=500):
-    """Get nearby amenities using Google Places API (excluding EV stations)"""
+@st.cache_data(ttl=LOOKUP_MEMORY_TTL)
+@disk_cached
+def fetch_station_contact(place_id):
+    """Get the full address and phone number of an EV station from Place Details, raising on failure"""
+    params = {
+        "place_id": place_id,
+        "fields": "formatted_address,formatted_phone_number",
+        "key": GOOGLE_API_KEY
+    }
+    result = google_json(google_get(PLACE_DETAILS_URL, params)).get("result", {})
+    return {
+        "address": result.get("formatted_address"),
+        "phone": result.get("formatted_phone_number", "N/A")
+    }
+
+def get_station_contact(place_id):
+    """Get an EV station's contact details, or None if the lookup failed"""
+    try:
+        return fetch_station_contact(place_id)
+    except Exception as e:
+        st.warning(f"Error getting EV station details: {e}")
+    return None
+
+def load_station_contact(place_id):
+    """Button callback: remember that the user asked for this station's contact details"""
+    st.session_state.setdefault("loaded_contacts", set()).add(place_id)
+
+@st.cache_data(ttl=LOOKUP_MEMORY_TTL)
+@disk_cached
+def fetch_nearby_amenities(lat, lon, radius=500):
+    """Get nearby amenities (excluding EV stations) from Google Places, raising if a search fails"""
     amenities = []
     
     place_types = [
@@ -286,144 +526,231 @@ def get_nearby_amenities(lat, lon, radius=500):
         "pharmacy", "bank", "atm", "lodging", "gas_station"
     ]
     
-    try:
-        url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+    url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+    base_params = {
+        "location": f"{lat},{lon}",
+        "radius": radius,
+        "key": GOOGLE_API_KEY
+    }
+    
+    # One untyped search usually covers most categories; sort its places
+    # into categories by their types, keeping the top 3 of each
+    top_places = {place_type: [] for place_type in place_types}
+    for place in google_json(google_get(url, base_params)).get("results", []):
+        for place_type in place.get("types", []):
+            hits = top_places.get(place_type)
+            if hits is not None and len(hits) < 3:
+                hits.append(place)
+    
+    # Only categories the untyped search missed entirely get a typed search of their own;
+    # one it found just one or two places for lists only those rather than a typed top 3
+    missing_types = [place_type for place_type in place_types if not top_places[place_type]]
+    executor = get_http_executor()
+    futures = [
+        submit_with_context(executor, google_get, url, {**base_params, "type": place_type})
+        for place_type in missing_types
+    ]
+    for place_type, future in zip(missing_types, futures):
+        top_places[place_type] = google_json(future.result()).get("results", [])[:3]
+    
+    for place_type in place_types:
+        display_type = place_type.replace("_", " ").title()
         
-        for place_type in place_types:
-            params = {
-                "location": f"{lat},{lon}",
-                "radius": radius,
-                "type": place_type,
-                "key": GOOGLE_API_KEY
-            }
+        for place in top_places[place_type]:
+            name = place.get("name", "Unknown")
+            rating = place.get("rating", "N/A")
             
-            response = requests.get(url, params=params, timeout=10)
+            name_lower = name.lower()
+            ev_keywords = ["electric", "ev", "charging", "tesla", "chargepoint"]
+            if any(keyword in name_lower for keyword in ev_keywords):
+                continue
             
-            if response.status_code == 200:
-                data = response.json()
-                
-                if data.get("status") == "OK":
-                    results = data.get("results", [])
-                    
-                    for place in results[:3]:
-                        name = place.get("name", "Unknown")
-                        rating = place.get("rating", "N/A")
-                        
-                        name_lower = name.lower()
-                        ev_keywords = ["electric", "ev", "charging", "tesla", "chargepoint"]
-                        if any(keyword in name_lower for keyword in ev_keywords):
-                            continue
-                        
-                        display_type = place_type.replace("_", " ").title()
-                        
-                        amenity_info = f"{name} ({display_type})"
-                        if rating != "N/A":
-                            amenity_info += f" ⭐{rating}"
-                            
-                        amenities.append(amenity_info)
+            amenity_info = f"{name} ({display_type})"
+            if rating != "N/A":
+                amenity_info += f" ⭐{rating}"
                 
-                elif data.get("status") == "ZERO_RESULTS":
-                    continue
-                else:
-                    st.warning(f"Places API error for {place_type}: {data.get('status')}")
-            
-            else:
-                st.warning(f"HTTP error {response.status_code} for {place_type}")
-            
-            time.sleep(0.1)
-        
-        return "; ".join(amenities[:15]) if amenities else "None nearby"
-        
+            amenities.append(amenity_info)
+    
+    return "; ".join(amenities[:15]) if amenities else "None nearby"
+
+def get_nearby_amenities(lat, lon, radius=500):
+    """Get nearby amenities using Google Places API (excluding EV stations)"""
+    try:
+        return fetch_nearby_amenities(lat, lon, radius)
     except Exception as e:
         st.warning(f"Places API error: {e}")
         return f"Error retrieving amenities: {str(e)}"
 
-@st.cache_data
-def get_road_info_google_roads(lat, lon):
-    """Get road information using Google Roads API"""
-    road_info = {
+ROADS_BATCH_SIZE = 100  # Max points per Google Roads request
+
+def empty_road_info():
+    """Road information for a site before any lookup has succeeded"""
+    return {
         "snapped_road_name": "Unknown",
         "snapped_road_type": "Unknown",
         "nearest_road_name": "Unknown", 
         "nearest_road_type": "Unknown",
         "place_id": None
     }
+
+@st.cache_data(ttl=LOOKUP_MEMORY_TTL)
+@disk_cached
+def fetch_road_place_details(place_id):
+    """Get the name and types of a road from its Google place ID, raising if the lookup fails"""
+    place_params = {
+        "place_id": place_id,
+        "fields": "name,types",
+        "key": GOOGLE_API_KEY
+    }
+    
+    place_response = google_get(PLACE_DETAILS_URL, params=place_params)
+    return google_json(place_response).get("result", {})
+
+def fill_road_info_from_geocode(lat, lon, road_info):
+    """Fallback: use reverse geocoding when the Roads API found no road (raises on API errors)"""
+    geocode_url = "https://maps.googleapis.com/maps/api/geocode/json"
+    geocode_params = {
+        "latlng": f"{lat},{lon}",
+        "key": GOOGLE_API_KEY
+    }
+    
+    geocode_data = google_json(google_get(geocode_url, params=geocode_params))
+    
+    if geocode_data.get("results"):
+        components = geocode_data["results"][0].get("address_components", [])
+        
+        for component in components:
+            types = component.get("types", [])
+            if "route" in types:
+                fallback_road_name = component.get("long_name", "Unknown Road")
+                fallback_road_type = classify_road_type_from_name(fallback_road_name)
+                
+                road_info["snapped_road_name"] = fallback_road_name
+                road_info["snapped_road_type"] = fallback_road_type
+                road_info["nearest_road_name"] = fallback_road_name
+                road_info["nearest_road_type"] = fallback_road_type
+                break
+
+@st.cache_data(ttl=LOOKUP_MEMORY_TTL)
+@disk_cached
+def fetch_snapped_place_id(lat, lon):
+    """Get the place ID of the road a point snaps to (None if none), raising if the lookup fails"""
+    snap_url = "https://roads.googleapis.com/v1/snapToRoads"
+    snap_params = {
+        "path": f"{lat},{lon}",
+        "interpolate": "true",
+        "key": GOOGLE_API_KEY
+    }
+    
+    snapped_points = google_json(google_get(snap_url, params=snap_params)).get("snappedPoints")
+    return snapped_points[0].get("placeId") if snapped_points else None
+
+def get_road_info_google_roads(lat, lon):
+    """Get road information using Google Roads API
+    
+    Follows the same steps as get_road_info_batch: snap to a road, look up its place
+    details, then reverse geocode if the road is still unknown. Only the snap and
+    details lookups are cached, so a failure in either is retried next time.
+    """
+    road_info = empty_road_info()
     
     try:
-        snap_url = "https://roads.googleapis.com/v1/snapToRoads"
-        snap_params = {
-            "path": f"{lat},{lon}",
-            "interpolate": "true",
-            "key": GOOGLE_API_KEY
-        }
+        place_id = fetch_snapped_place_id(lat, lon)
+        if place_id:
+            road_info["place_id"] = place_id
+            
+            result = fetch_road_place_details(place_id)
+            road_info["snapped_road_name"] = result.get("name", "Unknown Road")
+            
+            place_types = result.get("types", [])
+            road_info["snapped_road_type"] = classify_road_type(place_types, road_info["snapped_road_name"])
+    except Exception as e:
+        st.warning(f"Google Roads API error: {e}")
+    
+    # Fallback: Use reverse geocoding if APIs fail
+    if road_info["snapped_road_name"] == "Unknown":
+        try:
+            fill_road_info_from_geocode(lat, lon, road_info)
+        except Exception as e:
+            st.warning(f"Geocoding fallback error: {e}")
+    
+    return road_info
+
+def get_road_info_batch(points):
+    """Get road information for many (lat, lon) points with batched nearestRoads calls
+    
+    Best effort and not cached as a whole: points whose lookups fail keep "Unknown",
+    while each road's place details are cached by fetch_road_place_details.
+    """
+    road_infos = [empty_road_info() for _ in points]
+    
+    try:
+        url = "https://roads.googleapis.com/v1/nearestRoads"
+        executor = get_http_executor()
+        offsets = range(0, len(points), ROADS_BATCH_SIZE)
         
-        snap_response = requests.get(snap_url, params=snap_params, timeout=10)
+        futures = [
+            submit_with_context(executor, google_get, url, {
+                "points": "|".join(f"{lat},{lon}" for lat, lon in points[offset:offset + ROADS_BATCH_SIZE]),
+                "key": GOOGLE_API_KEY
+            })
+            for offset in offsets
+        ]
         
-        if snap_response.status_code == 200:
-            snap_data = snap_response.json()
+        for offset, future in zip(offsets, futures):
+            try:
+                response = future.result()
+            except Exception as e:
+                st.warning(f"Google Roads API error: {e}")
+                continue
             
-            if "snappedPoints" in snap_data and snap_data["snappedPoints"]:
-                snapped_point = snap_data["snappedPoints"][0]
-                place_id = snapped_point.get("placeId")
-                
-                if place_id:
-                    road_info["place_id"] = place_id
-                    
-                    place_url = "https://maps.googleapis.com/maps/api/place/details/json"
-                    place_params = {
-                        "place_id": place_id,
-                        "fields": "name,types,geometry,formatted_address",
-                        "key": GOOGLE_API_KEY
-                    }
-                    
-                    place_response = requests.get(place_url, params=place_params, timeout=10)
-                    
-                    if place_response.status_code == 200:
-                        place_data = place_response.json()
-                        
-                        if place_data.get("status") == "OK":
-                            result = place_data.get("result", {})
-                            road_info["snapped_road_name"] = result.get("name", "Unknown Road")
-                            
-                            place_types = result.get("types", [])
-                            road_info["snapped_road_type"] = classify_road_type(place_types, road_info["snapped_road_name"])
+            if response.status_code == 200:
+                # nearestRoads may return several roads per point; keep the first
+                for snapped_point in parse_json(response).get("snappedPoints", []):
+                    road_info = road_infos[offset + snapped_point.get("originalIndex", 0)]
+                    if road_info["place_id"] is None and snapped_point.get("placeId"):
+                        road_info["place_id"] = snapped_point["placeId"]
+            else:
+                st.warning(f"HTTP error {response.status_code} from Google Roads API")
+        
+        # Look up each distinct road once, however many sites sit on it
+        place_ids = {info["place_id"] for info in road_infos if info["place_id"]}
+        details_futures = {
+            place_id: submit_with_context(executor, fetch_road_place_details, place_id)
+            for place_id in place_ids
+        }
         
-        # Fallback: Use reverse geocoding if APIs fail
-        if road_info["snapped_road_name"] == "Unknown":
+        roads = {}
+        for place_id, future in details_futures.items():
             try:
-                geocode_url = "https://maps.googleapis.com/maps/api/geocode/json"
-                geocode_params = {
-                    "latlng": f"{lat},{lon}",
-                    "key": GOOGLE_API_KEY
-                }
-                
-                geocode_response = requests.get(geocode_url, params=geocode_params, timeout=10)
-                
-                if geocode_response.status_code == 200:
-                    geocode_data = geocode_response.json()
-                    
-                    if geocode_data.get("status") == "OK" and geocode_data.get("results"):
-                        components = geocode_data["results"][0].get("address_components", [])
-                        
-                        for component in components:
-                            types = component.get("types", [])
-                            if "route" in types:
-                                fallback_road_name = component.get("long_name", "Unknown Road")
-                                fallback_road_type = classify_road_type_from_name(fallback_road_name)
-                                
-                                road_info["snapped_road_name"] = fallback_road_name
-                                road_info["snapped_road_type"] = fallback_road_type
-                                road_info["nearest_road_name"] = fallback_road_name
-                                road_info["nearest_road_type"] = fallback_road_type
-                                break
-                
+                result = future.result()
             except Exception as e:
-                st.warning(f"Geocoding fallback error: {e}")
+                st.warning(f"Error getting road details: {e}")
+                continue
             
+            road_name = result.get("name", "Unknown Road")
+            roads[place_id] = (road_name, classify_road_type(result.get("types", []), road_name))
+        
+        for road_info in road_infos:
+            if road_info["place_id"] in roads:
+                road_info["snapped_road_name"], road_info["snapped_road_type"] = roads[road_info["place_id"]]
+        
+        # Fallback: Use reverse geocoding for points the Roads API missed
+        fallback_futures = [
+            submit_with_context(executor, fill_road_info_from_geocode, lat, lon, road_info)
+            for (lat, lon), road_info in zip(points, road_infos)
+            if road_info["snapped_road_name"] == "Unknown"
+        ]
+        for future in fallback_futures:
+            try:
+                future.result()
+            except Exception as e:
+                st.warning(f"Geocoding fallback error: {e}")
+    
     except Exception as e:
         st.warning(f"Google Roads API error: {e}")
     
-    return road_info
+    return road_infos
 
 def classify_road_type(place_types, road_name=""):
     """Classify road type based on Google Places API types and road name"""
@@ -446,237 +773,291 @@ def classify_road_type(place_types, road_name=""):
     else:
         return classify_road_type_from_name(road_name)
 
+# Road-name classes in priority order, compiled into one lookahead alternation so a
+# single scan finds every class present in the name (UK-focused)
+ROAD_NAME_CLASSES = (
+    ("motorway", r"motorway|m[1-6]", "Motorway"),
+    ("a_road", r"^a\s*\d+(?!\S)", "A Road"),
+    ("b_road", r"^b\s*\d+(?!\S)", "B Road"),
+    ("dual", r"dual carriageway|bypass", "Dual Carriageway"),
+    ("local", r"street|road|avenue|lane|drive|close|way", "Local Road"),
+    ("roundabout", r"roundabout|circus", "Roundabout"),
+)
+_ROAD_NAME_PATTERN = re.compile(
+    "(?=" + "|".join(f"(?P<{group}>{pattern})" for group, pattern, _ in ROAD_NAME_CLASSES) + ")",
+    re.IGNORECASE
+)
+_ROAD_NAME_PRIORITY = {group: i for i, (group, _, _) in enumerate(ROAD_NAME_CLASSES)}
+
 def classify_road_type_from_name(road_name):
     """Classify road type based on road name patterns (UK-focused)"""
     if not road_name or road_name == "Unknown Road":
         return "Local Road"
     
-    road_name_lower = road_name.lower()
-    
-    if any(keyword in road_name_lower for keyword in ["motorway", "m1", "m25", "m2", "m3", "m4", "m5", "m6"]):
-        return "Motorway"
-    elif road_name_lower.startswith("a") and len(road_name) > 1 and road_name[1:].split()[0].isdigit():
-        return "A Road"
-    elif road_name_lower.startswith("b") and len(road_name) > 1 and road_name[1:].split()[0].isdigit():
-        return "B Road"
-    elif any(keyword in road_name_lower for keyword in ["dual carriageway", "bypass"]):
-        return "Dual Carriageway"
-    elif any(keyword in road_name_lower for keyword in ["street", "road", "avenue", "lane", "drive", "close", "way"]):
-        return "Local Road"
-    elif any(keyword in road_name_lower for keyword in ["roundabout", "circus"]):
-        return "Roundabout"
-    else:
-        return "Local Road"
+    groups = {m.lastgroup for m in _ROAD_NAME_PATTERN.finditer(road_name)}
+    if groups:
+        return ROAD_NAME_CLASSES[min(_ROAD_NAME_PRIORITY[group] for group in groups)][2]
+    return "Local Road"
 
 @st.cache_resource
 def get_transformer():
-    """Get coordinate transformer for British National Grid"""
-    return Transformer.from_crs("epsg:4326","epsg:27700")
+    """Get coordinate transformer for British National Grid (lon, lat axis order)"""
+    return Transformer.from_crs("epsg:4326","epsg:27700", always_xy=True)
 
 def convert_to_british_grid(lat, lon):
     """Convert WGS84 coordinates to British National Grid"""
     transformer = get_transformer()
     try:
-        e, n = transformer.transform(lat, lon)
+        e, n = transformer.transform(lon, lat)
         return round(e), round(n)
     except Exception as e:
         st.warning(f"Coordinate transformation error: {e}")
         return None, None
 
+def convert_batch_to_british_grid(lats, lons):
+    """Convert arrays of WGS84 coordinates to British National Grid in a single transform call
+    
+    Returns one (easting, northing) pair per point, (None, None) where the transform fails.
+    """
+    try:
+        e, n = get_transformer().transform(np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64))
+        valid = np.isfinite(e) & np.isfinite(n)
+        eastings = np.round(np.where(valid, e, 0)).astype(np.int64).tolist()
+        northings = np.round(np.where(valid, n, 0)).astype(np.int64).tolist()
+        return [
+            (easting, northing) if ok else (None, None)
+            for easting, northing, ok in zip(eastings, northings, valid.tolist())
+        ]
+    except Exception as e:
+        st.warning(f"Coordinate transformation error: {e}")
+        return [(None, None)] * len(lats)
+
 def calculate_kva(fast, rapid, ultra, fast_kw=22, rapid_kw=60, ultra_kw=150):
     """Calculate required kVA capacity"""
     total_kw = fast * fast_kw + rapid * rapid_kw + ultra * ultra_kw
     return round(total_kw / 0.9 * 1.1, 2)
 
+# Live traffic goes stale quickly, so it is only reused for a few minutes and never persisted
+@st.cache_data(ttl=180)
+def fetch_tomtom_traffic(lat, lon):
+    """Get traffic flow from the TomTom API, raising if the lookup fails"""
+    url = "https://api.tomtom.com/traffic/services/4/flowSegmentData/absolute/10/json"
+    params = {"point": f"{lat},{lon}", "key": TOMTOM_API_KEY}
+    r = get_http_session().get(url, params=params, timeout=10)
+    r.raise_for_status()
+    
+    flow = parse_json(r).get("flowSegmentData", {})
+    speed, freeflow = flow.get("currentSpeed"), flow.get("freeFlowSpeed")
+    if speed and freeflow and freeflow > 0:
+        ratio = speed / freeflow
+        if ratio > 0.85:
+            level = "Low"
+        elif ratio > 0.6:
+            level = "Medium"
+        else:
+            level = "High"
+        return {"speed": speed, "freeFlow": freeflow, "congestion": level}
+    return {"speed": None, "freeFlow": None, "congestion": "N/A"}
+
 def get_tomtom_traffic(lat, lon):
     """Get traffic information from TomTom API"""
     if not TOMTOM_API_KEY:
         return {"speed": None, "freeFlow": None, "congestion": "N/A"}
         
     try:
-        url = "https://api.tomtom.com/traffic/services/4/flowSegmentData/absolute/10/json"
-        params = {"point": f"{lat},{lon}", "key": TOMTOM_API_KEY}
-        r = requests.get(url, params=params, timeout=10)
-        
-        if r.status_code == 200:
-            flow = r.json().get("flowSegmentData", {})
-            speed, freeflow = flow.get("currentSpeed"), flow.get("freeFlowSpeed")
-            if speed and freeflow and freeflow > 0:
-                ratio = speed / freeflow
-                if ratio > 0.85:
-                    level = "Low"
-                elif ratio > 0.6:
-                    level = "Medium"
-                else:
-                    level = "High"
-                return {"speed": speed, "freeFlow": freeflow, "congestion": level}
+        return fetch_tomtom_traffic(lat, lon)
     except Exception as e:
         st.warning(f"TomTom API error: {e}")
     
     return {"speed": None, "freeFlow": None, "congestion": "N/A"}
 
 def process_site(lat, lon, fast, rapid, ultra, fast_kw, rapid_kw, ultra_kw,
-                 competitor_radius: int = 1000, amenities_radius: int = 500):
-    """Process a single site and gather all information"""
-    with st.spinner(f"Processing site at {lat}, {lon}..."):
-        result = {
-            "latitude": lat,
-            "longitude": lon,
-            "easting": None,
-            "northing": None,
-            "postcode": "N/A",
-            "ward": "N/A",
-            "district": "N/A",
-            "street": "N/A",
-            "street_number": "N/A",
-            "neighborhood": "N/A",
-            "city": "N/A",
-            "county": "N/A",
-            "region": "N/A",
-            "country": "N/A",
-            "formatted_address": "N/A",
-            "fast_chargers": fast,
-            "rapid_chargers": rapid,
-            "ultra_chargers": ultra,
-            "required_kva": 0,
-            "traffic_speed": None,
-            "traffic_freeflow": None,
-            "traffic_congestion": "N/A",
-            "amenities": "N/A",
-            "snapped_road_name": "Unknown",
-            "snapped_road_type": "Unknown",
-            "nearest_road_name": "Unknown",
-            "nearest_road_type": "Unknown",
-            "place_id": None,
-            "competitor_ev_count": 0,
-            "competitor_ev_names": "None",
-            "ev_stations_details": []
-        }
+                 competitor_radius: int = 1000, amenities_radius: int = 500,
+                 road_info=None, grid=None):
+    """Process a single site and gather all information
+    
+    Batch runs pass road_info from get_road_info_batch to skip the per-site Roads lookup,
+    and grid (easting, northing) from convert_batch_to_british_grid.
+    """
+    result = SiteResult(
+        latitude=lat,
+        longitude=lon,
+        fast_chargers=fast,
+        rapid_chargers=rapid,
+        ultra_chargers=ultra
+    )
+    
+    try:
+        # The API lookups are independent, so issue them all at once
+        search_lat, search_lon = snap_to_search_grid(lat), snap_to_search_grid(lon)
         
-        try:
-            easting, northing = convert_to_british_grid(lat, lon)
-            result["easting"] = easting
-            result["northing"] = northing
-            
-            kva = calculate_kva(fast, rapid, ultra, fast_kw, rapid_kw, ultra_kw)
-            result["required_kva"] = kva
-            
-            postcode, ward, district = get_postcode_info(lat, lon)
-            result["postcode"] = postcode
-            result["ward"] = ward
-            result["district"] = district
-            
-            geo = get_geocode_details(lat, lon)
-            result.update({
-                "street": geo.get("street", "N/A"),
-                "street_number": geo.get("street_number", "N/A"),
-                "neighborhood": geo.get("neighborhood", "N/A"),
-                "city": geo.get("city", "N/A"),
-                "county": geo.get("county", "N/A"),
-                "region": geo.get("region", "N/A"),
-                "country": geo.get("country", "N/A"),
-                "formatted_address": geo.get("formatted_address", "N/A")
-            })
-            
-            traffic = get_tomtom_traffic(lat, lon)
-            result.update({
-                "traffic_speed": traffic["speed"],
-                "traffic_freeflow": traffic["freeFlow"],
-                "traffic_congestion": traffic["congestion"]
-            })
-            
-            amenities = get_nearby_amenities(lat, lon, amenities_radius)
-            result["amenities"] = amenities
-            
-            ev_stations = get_ev_charging_stations(lat, lon, competitor_radius)
-            ev_count = len(ev_stations)
-            ev_names = [station["name"] for station in ev_stations]
-            ev_names_str = "; ".join(ev_names) if ev_names else "None"
-            
-            result.update({
-                "competitor_ev_count": ev_count,
-                "competitor_ev_names": ev_names_str,
-                "ev_stations_details": ev_stations,
-                "competitor_radius": competitor_radius,
-                "amenities_radius": amenities_radius
-            })
-            
-            road_info = get_road_info_google_roads(lat, lon)
-            result.update({
-                "snapped_road_name": road_info.get("snapped_road_name", "Unknown"),
-                "snapped_road_type": road_info.get("snapped_road_type", "Unknown"),
-                "nearest_road_name": road_info.get("nearest_road_name", "Unknown"),
-                "nearest_road_type": road_info.get("nearest_road_type", "Unknown"),
-                "place_id": road_info.get("place_id")
-            })
-            
-        except Exception as e:
-            st.warning(f"Error processing some data for site {lat}, {lon}: {e}")
+        executor = get_site_executor()
+        postcode_future = submit_with_context(executor, get_postcode_info, lat, lon)
+        geo_future = submit_with_context(executor, get_geocode_details, lat, lon)
+        traffic_future = submit_with_context(executor, get_tomtom_traffic, lat, lon)
+        amenities_future = submit_with_context(executor, get_nearby_amenities, search_lat, search_lon, amenities_radius)
+        ev_future = submit_with_context(executor, get_ev_charging_stations, search_lat, search_lon, competitor_radius)
+        if road_info is None:
+            road_future = submit_with_context(executor, get_road_info_google_roads, lat, lon)
         
-        return result
+        if grid is None:
+            grid = convert_to_british_grid(lat, lon)
+        result.easting, result.northing = grid
+        
+        result.required_kva = calculate_kva(fast, rapid, ultra, fast_kw, rapid_kw, ultra_kw)
+        
+        result.postcode, result.ward, result.district = postcode_future.result()
+        
+        geo = geo_future.result()
+        result.street = geo.get("street", "N/A")
+        result.street_number = geo.get("street_number", "N/A")
+        result.neighborhood = geo.get("neighborhood", "N/A")
+        result.city = geo.get("city", "N/A")
+        result.county = geo.get("county", "N/A")
+        result.region = geo.get("region", "N/A")
+        result.country = geo.get("country", "N/A")
+        result.formatted_address = geo.get("formatted_address", "N/A")
+        
+        traffic = traffic_future.result()
+        result.traffic_speed = traffic["speed"]
+        result.traffic_freeflow = traffic["freeFlow"]
+        result.traffic_congestion = traffic["congestion"]
+        
+        result.amenities = amenities_future.result()
+        
+        ev_stations = ev_future.result()
+        
+        result.competitor_ev_count = len(ev_stations)
+        result.competitor_ev_names = "; ".join(ev_stations["name"]) if not ev_stations.empty else "None"
+        result.ev_stations_details = ev_stations
+        result.competitor_radius = competitor_radius
+        result.amenities_radius = amenities_radius
+        
+        if road_info is None:
+            road_info = road_future.result()
+        result.snapped_road_name = road_info.get("snapped_road_name", "Unknown")
+        result.snapped_road_type = road_info.get("snapped_road_type", "Unknown")
+        result.nearest_road_name = road_info.get("nearest_road_name", "Unknown")
+        result.nearest_road_type = road_info.get("nearest_road_type", "Unknown")
+        result.place_id = road_info.get("place_id")
+        
+    except Exception as e:
+        st.warning(f"Error processing some data for site {lat}, {lon}: {e}")
+    
+    return result
 
 # ==============================
 # MAP FUNCTIONS
 # ==============================
 
+# Google tile templates are built once; folium fills in {x}, {y} and {z}
+GOOGLE_TILE_URL = f"https://mt1.google.com/vt/lyrs=m&x={{x}}&y={{y}}&z={{z}}&key={GOOGLE_API_KEY}"
+GOOGLE_TRAFFIC_URL = f"https://mt1.google.com/vt/lyrs=h,traffic&x={{x}}&y={{y}}&z={{z}}&key={GOOGLE_API_KEY}"
+GOOGLE_TILE_MAX_ZOOM = 20
+
+# Proposed sites are drawn as plain SVG circles; no icon font is needed per marker
+SITE_MARKER_STYLE = {
+    "radius": 8,
+    "color": "#ff69b4",
+    "weight": 2,
+    "fill": True,
+    "fill_color": "#ff69b4",
+    "fill_opacity": 0.9
+}
+
+# Popup for proposed-site markers on every map, compiled once rather than
+# re-parsed as an f-string per site; $competitors is an optional extra line
+SITE_POPUP = Template("""
+    <b>📍 $heading</b><br>
+    <b>🔌 Power:</b> $kva kVA<br>
+    <b>🛣️ Road:</b> $road_name ($road_type)<br>
+    <b>🚦 Traffic:</b> $traffic<br>$competitors
+    <b>🏪 Nearby:</b> $amenities$ellipsis
+    """)
+
+# Builds each competitor marker in the browser from a compact data row:
+# [lat, lng, name, rating, address, site number or null]
+# Phone numbers are only fetched on demand, so they are not shown here
+COMPETITOR_MARKER_JS = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.setIcon(L.AwesomeMarkers.icon({icon: 'flash', prefix: 'fa', markerColor: 'red'}));
+    var popup = '<b>⚡ ' + row[2] + '</b><br>';
+    if (row[5] !== null) {
+        popup += '<b>Near Site:</b> ' + row[5] + '<br>';
+    }
+    popup += '<b>Rating:</b> ' + row[3] + '<br>' +
+             '<b>Address:</b> ' + row[4];
+    marker.bindPopup(popup, {maxWidth: 300});
+    marker.bindTooltip('⚡ Competitor: ' + row[2]);
+    return marker;
+}
+"""
+
+def competitor_marker_rows(ev_stations):
+    """Flatten a competitor-station frame into the rows expected by COMPETITOR_MARKER_JS"""
+    if ev_stations.empty:
+        return []
+    
+    rows = pd.DataFrame({
+        'latitude': ev_stations['latitude'],
+        'longitude': ev_stations['longitude'],
+        'name': ev_stations['name'].fillna('Unknown EV Station'),
+        'rating': ev_stations['rating'].fillna('N/A'),
+        'address': ev_stations['address'].fillna('N/A'),
+        'site_number': ev_stations['site_number'] if 'site_number' in ev_stations else None
+    })
+    rows = rows[rows['latitude'].notna() & rows['longitude'].notna()]
+    return rows.astype(object).where(rows.notna(), None).values.tolist()
+
+def add_competitor_markers(m, rows):
+    """Add competitor EV stations to a map as a single clustered layer"""
+    if rows:
+        FastMarkerCluster(rows, callback=COMPETITOR_MARKER_JS, name="Competitors").add_to(m)
+
 def add_google_traffic_layer(m):
     """Add Google Traffic layer to folium map"""
     folium.TileLayer(
-        tiles=f"https://mt1.google.com/vt/lyrs=h,traffic&x={{x}}&y={{y}}&z={{z}}&key={GOOGLE_API_KEY}",
+        tiles=GOOGLE_TRAFFIC_URL,
+        max_zoom=GOOGLE_TILE_MAX_ZOOM,
         attr="Google Traffic",
         name="Traffic",
         overlay=True,
         control=True
     ).add_to(m)
 
+def site_popup(site, heading, show_competitors=True):
+    """Build the popup HTML for a proposed-site marker"""
+    amenities = site.amenities
+    return SITE_POPUP.substitute(
+        heading=heading,
+        kva=site.required_kva,
+        road_name=site.snapped_road_name,
+        road_type=site.snapped_road_type,
+        traffic=site.traffic_congestion,
+        competitors=f"\n    <b>⚡ Competitor EVs:</b> {site.competitor_ev_count}<br>" if show_competitors else "",
+        amenities=amenities[:100],
+        ellipsis='...' if len(str(amenities)) > 100 else ''
+    )
+
 def create_single_map(site, show_traffic=False):
     """Create a map for a single site"""
     m = folium.Map(
-        location=[site["latitude"], site["longitude"]], 
+        location=[site.latitude, site.longitude], 
         zoom_start=15,
-        tiles=f"https://mt1.google.com/vt/lyrs=m&x={{x}}&y={{y}}&z={{z}}&key={GOOGLE_API_KEY}", 
+        tiles=GOOGLE_TILE_URL,
+        max_zoom=GOOGLE_TILE_MAX_ZOOM,
         attr="Google Maps"
     )
     
-    popup_content = f"""
-    <b>📍 {site.get('formatted_address', 'Unknown Address')}</b><br>
-    <b>🔌 Power:</b> {site.get('required_kva','N/A')} kVA<br>
-    <b>🛣️ Road:</b> {site.get('snapped_road_name','N/A')} ({site.get('snapped_road_type','N/A')})<br>
-    <b>🚦 Traffic:</b> {site.get('traffic_congestion','N/A')}<br>
-    <b>⚡ Competitor EVs:</b> {site.get('competitor_ev_count', 0)}<br>
-    <b>🏪 Nearby:</b> {site.get('amenities','N/A')[:100]}{'...' if len(str(site.get('amenities',''))) > 100 else ''}
-    """
-    
-    folium.Marker(
-        [site["latitude"], site["longitude"]], 
-        popup=folium.Popup(popup_content, max_width=350),
+    folium.CircleMarker(
+        [site.latitude, site.longitude], 
+        popup=folium.Popup(site_popup(site, site.formatted_address), max_width=350),
         tooltip="🔋 EV Charging Site",
-        icon=folium.Icon(color="pink", icon="bolt", prefix="fa")
+        **SITE_MARKER_STYLE
     ).add_to(m)
     
-    ev_stations = site.get('ev_stations_details', [])
-    for i, station in enumerate(ev_stations):
-        try:
-            station_lat = station.get('latitude')
-            station_lng = station.get('longitude')
-            
-            if station_lat and station_lng:
-                ev_popup = f"""
-                <b>⚡ {station.get('name', 'Unknown EV Station')}</b><br>
-                <b>Rating:</b> {station.get('rating', 'N/A')}<br>
-                <b>Address:</b> {station.get('address', 'N/A')}<br>
-                <b>Phone:</b> {station.get('phone', 'N/A')}
-                """
-                
-                folium.Marker(
-                    [station_lat, station_lng],
-                    popup=folium.Popup(ev_popup, max_width=300),
-                    tooltip=f"⚡ Competitor: {station.get('name', 'EV Station')}",
-                    icon=folium.Icon(color="red", icon="flash", prefix="fa")
-                ).add_to(m)
-        except Exception as e:
-            st.warning(f"Error adding EV station marker: {e}")
-            continue
+    add_competitor_markers(m, competitor_marker_rows(site.ev_stations_details))
     
     if show_traffic:
         add_google_traffic_layer(m)
@@ -684,39 +1065,34 @@ def create_single_map(site, show_traffic=False):
     folium.LayerControl().add_to(m)
     return m
 
+def sites_center(sites):
+    """Mean [lat, lon] of the sites, used to centre multi-site maps"""
+    return np.array([(s.latitude, s.longitude) for s in sites], dtype=float).mean(axis=0).tolist()
+
 def create_sites_only_map(sites, show_traffic: bool = False):
     """Create a map showing only the proposed sites (no competitors)"""
     if not sites:
         return None
         
-    valid_sites = [s for s in sites if s.get("latitude") and s.get("longitude")]
+    valid_sites = [s for s in sites if s.latitude and s.longitude]
     if not valid_sites:
         return None
         
-    center_lat = sum(s["latitude"] for s in valid_sites) / len(valid_sites)
-    center_lon = sum(s["longitude"] for s in valid_sites) / len(valid_sites)
-    
     m = folium.Map(
-        location=[center_lat, center_lon], 
+        location=sites_center(valid_sites), 
         zoom_start=8,
-        tiles=f"https://mt1.google.com/vt/lyrs=m&x={{x}}&y={{y}}&z={{z}}&key={GOOGLE_API_KEY}", 
+        tiles=GOOGLE_TILE_URL,
+        max_zoom=GOOGLE_TILE_MAX_ZOOM,
         attr="Google Maps"
     )
     
     for i, site in enumerate(valid_sites):
-        popup_content = f"""
-        <b>📍 Site {i+1}:</b> {site.get('formatted_address','Unknown Address')}<br>
-        <b>🔌 Power:</b> {site.get('required_kva','N/A')} kVA<br>
-        <b>🛣️ Road:</b> {site.get('snapped_road_name','N/A')} ({site.get('snapped_road_type','N/A')})<br>
-        <b>🚦 Traffic:</b> {site.get('traffic_congestion','N/A')}<br>
-        <b>🏪 Nearby:</b> {site.get('amenities','N/A')[:100]}{'...' if len(str(site.get('amenities',''))) > 100 else ''}
-        """
-        
-        folium.Marker(
-            [site["latitude"], site["longitude"]], 
+        popup_content = site_popup(site, f"Site {i+1}: {site.formatted_address}", show_competitors=False)
+        folium.CircleMarker(
+            [site.latitude, site.longitude], 
             popup=folium.Popup(popup_content, max_width=350),
             tooltip=f"🔋 EV Site {i+1}",
-            icon=folium.Icon(color="pink", icon="bolt", prefix="fa")
+            **SITE_MARKER_STYLE
         ).add_to(m)
     if show_traffic:
         add_google_traffic_layer(m)
@@ -728,60 +1104,39 @@ def create_batch_map(sites, show_traffic=False):
     if not sites:
         return None
         
-    valid_sites = [s for s in sites if s.get("latitude") and s.get("longitude")]
+    valid_sites = [s for s in sites if s.latitude and s.longitude]
     if not valid_sites:
         return None
         
-    center_lat = sum(s["latitude"] for s in valid_sites) / len(valid_sites)
-    center_lon = sum(s["longitude"] for s in valid_sites) / len(valid_sites)
-    
     m = folium.Map(
-        location=[center_lat, center_lon], 
+        location=sites_center(valid_sites), 
         zoom_start=8,
-        tiles=f"https://mt1.google.com/vt/lyrs=m&x={{x}}&y={{y}}&z={{z}}&key={GOOGLE_API_KEY}", 
+        tiles=GOOGLE_TILE_URL,
+        max_zoom=GOOGLE_TILE_MAX_ZOOM,
         attr="Google Maps"
     )
     
+    competitor_frames = []
     for i, site in enumerate(valid_sites):
-        popup_content = f"""
-        <b>📍 Site {i+1}:</b> {site.get('formatted_address','Unknown Address')}<br>
-        <b>🔌 Power:</b> {site.get('required_kva','N/A')} kVA<br>
-        <b>🛣️ Road:</b> {site.get('snapped_road_name','N/A')} ({site.get('snapped_road_type','N/A')})<br>
-        <b>🚦 Traffic:</b> {site.get('traffic_congestion','N/A')}<br>
-        <b>⚡ Competitor EVs:</b> {site.get('competitor_ev_count', 0)}<br>
-        <b>🏪 Nearby:</b> {site.get('amenities','N/A')[:100]}{'...' if len(str(site.get('amenities',''))) > 100 else ''}
-        """
-        
-        folium.Marker(
-            [site["latitude"], site["longitude"]], 
+        popup_content = site_popup(site, f"Site {i+1}: {site.formatted_address}")
+        folium.CircleMarker(
+            [site.latitude, site.longitude], 
             popup=folium.Popup(popup_content, max_width=350),
             tooltip=f"🔋 EV Site {i+1}",
-            icon=folium.Icon(color="pink", icon="bolt", prefix="fa")
+            **SITE_MARKER_STYLE
         ).add_to(m)
         
-        ev_stations = site.get('ev_stations_details', [])
-        for j, station in enumerate(ev_stations):
-            try:
-                station_lat = station.get('latitude')
-                station_lng = station.get('longitude')
-                
-                if station_lat and station_lng:
-                    ev_popup = f"""
-                    <b>⚡ {station.get('name', 'Unknown EV Station')}</b><br>
-                    <b>Near Site:</b> {i+1}<br>
-                    <b>Rating:</b> {station.get('rating', 'N/A')}<br>
-                    <b>Address:</b> {station.get('address', 'N/A')}<br>
-                    <b>Phone:</b> {station.get('phone', 'N/A')}
-                    """
-                    
-                    folium.Marker(
-                        [station_lat, station_lng],
-                        popup=folium.Popup(ev_popup, max_width=300),
-                        tooltip=f"⚡ Competitor: {station.get('name', 'EV Station')}",
-                        icon=folium.Icon(color="red", icon="flash", prefix="fa")
-                    ).add_to(m)
-            except Exception as e:
-                continue
+        competitor_frames.append(site.ev_stations_details.assign(site_number=i+1))
+    
+    # Neighbouring sites often find the same station; draw it once and list every site it is near
+    competitors = pd.concat(competitor_frames, ignore_index=True)
+    competitors = (
+        competitors.astype({'site_number': str})
+        .groupby('place_id', sort=False)
+        .agg({**{col: 'first' for col in EV_STATION_COLUMNS if col != 'place_id'}, 'site_number': ', '.join})
+        .reset_index()
+    )
+    add_competitor_markers(m, competitor_marker_rows(competitors))
     
     if show_traffic:
         add_google_traffic_layer(m)
@@ -789,6 +1144,15 @@ def create_batch_map(sites, show_traffic=False):
     folium.LayerControl().add_to(m)
     return m
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def get_map_html(map_key, _build_map):
+    """Build a map with _build_map and render it to a standalone HTML page, once per map_key
+    
+    map_key identifies the analysis run and view; the builder and its sites are not hashed.
+    """
+    m = _build_map()
+    return m.get_root().render() if m is not None else None
+
 # ==============================
 # STREAMLIT APP
 # ==============================
@@ -847,14 +1211,16 @@ with tab1:
             if not (-90 <= lat_float <= 90) or not (-180 <= lon_float <= 180):
                 st.error("Invalid coordinates. Latitude must be between -90 and 90, longitude between -180 and 180.")
             else:
-                site = process_site(
-                    lat_float, lon_float,
-                    fast, rapid, ultra,
-                    fast_kw, rapid_kw, ultra_kw,
-                    competitor_radius=competitor_radius,
-                    amenities_radius=amenities_radius
-                )
+                with st.spinner(f"Processing site at {lat_float}, {lon_float}..."):
+                    site = process_site(
+                        lat_float, lon_float,
+                        fast, rapid, ultra,
+                        fast_kw, rapid_kw, ultra_kw,
+                        competitor_radius=competitor_radius,
+                        amenities_radius=amenities_radius
+                    )
                 st.session_state["single_site"] = site
+                st.session_state["single_run_id"] = uuid.uuid4().hex
                 st.success("✅ Site analysis completed!")
         except ValueError:
             st.error("Invalid coordinate format. Please enter numeric values.")
@@ -863,95 +1229,114 @@ with tab1:
 
     if "single_site" in st.session_state:
         site = st.session_state["single_site"]
+        run_id = st.session_state["single_run_id"]
         
         # Key metrics
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Required kVA", site.get("required_kva", "N/A"))
+            st.metric("Required kVA", site.required_kva)
         with col2:
-            st.metric("Snapped Road Type", site.get("snapped_road_type", "Unknown"))
+            st.metric("Snapped Road Type", site.snapped_road_type)
         with col3:
-            st.metric("Traffic Level", site.get("traffic_congestion", "N/A"))
+            st.metric("Traffic Level", site.traffic_congestion)
         with col4:
-            ev_count = site.get("competitor_ev_count", 0)
+            ev_count = site.competitor_ev_count
             st.metric("Competitor EVs", ev_count)
         
         # Detailed information
         st.subheader("📋 Detailed Site Information")
         
-        detail_tabs = st.tabs(["🏠 Location", "🔌 Power", "🛣️ Road Info", "🚦 Traffic", "🏪 Amenities", "⚡ EV Competitors", "🗺️ Site Map"])
+        detail_tabs = st.tabs(
+            ["🏠 Location", "🔌 Power", "🛣️ Road Info", "🚦 Traffic", "🏪 Amenities", "⚡ EV Competitors", "🗺️ Site Map"],
+            key="single_detail_view", on_change="rerun"
+        )
         
         with detail_tabs[0]:
-            st.write(f"**Address:** {site.get('formatted_address', 'N/A')}")
-            st.write(f"**Postcode:** {site.get('postcode', 'N/A')}")
-            st.write(f"**Ward:** {site.get('ward', 'N/A')}")
-            st.write(f"**District:** {site.get('district', 'N/A')}")
-            st.write(f"**British Grid:** {site.get('easting', 'N/A')}, {site.get('northing', 'N/A')}")
+            st.write(f"**Address:** {site.formatted_address}")
+            st.write(f"**Postcode:** {site.postcode}")
+            st.write(f"**Ward:** {site.ward}")
+            st.write(f"**District:** {site.district}")
+            st.write(f"**British Grid:** {site.easting}, {site.northing}")
         
         with detail_tabs[1]:
-            st.write(f"**Fast Chargers:** {site.get('fast_chargers', 0)} × {fast_kw}kW")
-            st.write(f"**Rapid Chargers:** {site.get('rapid_chargers', 0)} × {rapid_kw}kW")
-            st.write(f"**Ultra Chargers:** {site.get('ultra_chargers', 0)} × {ultra_kw}kW")
-            st.write(f"**Total Required kVA:** {site.get('required_kva', 'N/A')}")
+            st.write(f"**Fast Chargers:** {site.fast_chargers} × {fast_kw}kW")
+            st.write(f"**Rapid Chargers:** {site.rapid_chargers} × {rapid_kw}kW")
+            st.write(f"**Ultra Chargers:** {site.ultra_chargers} × {ultra_kw}kW")
+            st.write(f"**Total Required kVA:** {site.required_kva}")
         
         with detail_tabs[2]:
-            st.write(f"**Snapped Road Name:** {site.get('snapped_road_name', 'Unknown')}")
-            st.write(f"**Snapped Road Type:** {site.get('snapped_road_type', 'Unknown')}")
-            st.write(f"**Nearest Road Name:** {site.get('nearest_road_name', 'Unknown')}")
-            st.write(f"**Nearest Road Type:** {site.get('nearest_road_type', 'Unknown')}")
-            if site.get('place_id'):
-                st.write(f"**Google Place ID:** {site['place_id']}")
+            st.write(f"**Snapped Road Name:** {site.snapped_road_name}")
+            st.write(f"**Snapped Road Type:** {site.snapped_road_type}")
+            st.write(f"**Nearest Road Name:** {site.nearest_road_name}")
+            st.write(f"**Nearest Road Type:** {site.nearest_road_type}")
+            if site.place_id:
+                st.write(f"**Google Place ID:** {site.place_id}")
         
         with detail_tabs[3]:
-            st.write(f"**Congestion Level:** {site.get('traffic_congestion', 'N/A')}")
-            if site.get('traffic_speed'):
-                st.write(f"**Current Speed:** {site['traffic_speed']} mph")
-                st.write(f"**Free Flow Speed:** {site['traffic_freeflow']} mph")
+            st.write(f"**Congestion Level:** {site.traffic_congestion}")
+            if site.traffic_speed:
+                st.write(f"**Current Speed:** {site.traffic_speed} mph")
+                st.write(f"**Free Flow Speed:** {site.traffic_freeflow} mph")
         
         with detail_tabs[4]:
-            st.write(f"**Nearby Amenities:** {site.get('amenities', 'N/A')}")
+            st.write(f"**Nearby Amenities:** {site.amenities}")
         
         with detail_tabs[5]:
-            st.write(f"**Number of Competitor EV Stations:** {site.get('competitor_ev_count', 0)}")
-            st.write(f"**Competitor Names:** {site.get('competitor_ev_names', 'None')}")
+            st.write(f"**Number of Competitor EV Stations:** {site.competitor_ev_count}")
+            st.write(f"**Competitor Names:** {site.competitor_ev_names}")
             
-            ev_stations = site.get('ev_stations_details', [])
-            if ev_stations:
+            ev_stations = site.ev_stations_details
+            if not ev_stations.empty:
                 col_comp1, col_comp2 = st.columns(2)
                 
                 with col_comp1:
                     st.subheader("🔍 Detailed Competitor Information")
-                    for i, station in enumerate(ev_stations):
-                        with st.expander(f"⚡ {station.get('name', f'EV Station {i+1}')}"):
-                            st.write(f"**Rating:** {station.get('rating', 'N/A')}")
-                            st.write(f"**Address:** {station.get('address', 'N/A')}")
-                            st.write(f"**Phone:** {station.get('phone', 'N/A')}")
-                            st.write(f"**Coordinates:** {station.get('latitude', 'N/A')}, {station.get('longitude', 'N/A')}")
+                    for i, station in enumerate(ev_stations.itertuples(index=False)):
+                        with st.expander(f"⚡ {station.name or f'EV Station {i+1}'}"):
+                            st.write(f"**Rating:** {station.rating}")
+                            contact = None
+                            if station.place_id in st.session_state.get("loaded_contacts", ()):
+                                contact = get_station_contact(station.place_id)
+                                if contact is None:
+                                    # Offer the button again so the lookup can be retried
+                                    st.session_state["loaded_contacts"].discard(station.place_id)
+                            if contact is not None:
+                                st.write(f"**Address:** {contact['address'] or station.address}")
+                                st.write(f"**Phone:** {contact['phone']}")
+                            else:
+                                st.write(f"**Address:** {station.address}")
+                                st.button(
+                                    "📞 Show contact details",
+                                    key=f"contact_{station.place_id}",
+                                    on_click=load_station_contact,
+                                    args=(station.place_id,)
+                                )
+                            st.write(f"**Coordinates:** {station.latitude}, {station.longitude}")
                             
-                            if station.get('photo_url'):
-                                try:
-                                    st.image(station['photo_url'], caption=station.get('name', 'EV Station'), width=200)
-                                except:
-                                    st.write("📷 Photo unavailable")
+                            if pd.notna(station.photo_url):
+                                # Let the browser fetch the photo only once the expander is opened
+                                st.markdown(
+                                    f'<img src="{html.escape(station.photo_url)}" loading="lazy" width="200" '
+                                    f'alt="{html.escape(station.name or "EV Station")}" '
+                                    f'onerror="this.style.display=\'none\'">',
+                                    unsafe_allow_html=True
+                                )
                             else:
                                 st.write("📷 No photo available")
                 
                 with col_comp2:
                     st.subheader("📊 Competitor Market Share")
                     
-                    competitor_brands = {}
-                    for station in ev_stations:
-                        name = station.get('name', 'Unknown')
-                        brand = extract_brand_name(name)
-                        competitor_brands[brand] = competitor_brands.get(brand, 0) + 1
+                    brand_counts = compute_market_share(tuple(ev_stations['name']))
+                    competitor_brands = brand_counts.to_dict()
                     
                     if competitor_brands:
-                        total_stations = sum(competitor_brands.values())
+                        counts = brand_counts.to_numpy()
+                        percentages = counts / counts.sum() * 100
                         
                         st.write("**Market Share Distribution:**")
-                        for brand, count in competitor_brands.items():
-                            percentage = (count / total_stations) * 100
+                        for brand, count, percentage in zip(brand_counts.index, counts.tolist(), percentages.tolist()):
                             st.write(f"**{brand}**: {count} stations ({percentage:.1f}%)")
                             st.progress(percentage / 100)
                         
@@ -977,20 +1362,32 @@ with tab1:
                 st.info("No competitor EV charging stations found nearby.")
         
         with detail_tabs[6]:
-            map_tabs = st.tabs(["🗺️ Site Only", "🗺️ Site + Competitors"])
+            if detail_tabs[6].open:
+                map_tabs = st.tabs(["🗺️ Site Only", "🗺️ Site + Competitors"], key="single_map_view", on_change="rerun")
             
-            with map_tabs[0]:
-                st.markdown("*Pink marker: Your proposed site*")
-                only_map = create_sites_only_map([site], show_traffic_single)
-                if only_map:
-                    st_folium(only_map, width=700, height=500, key="single_site_only_map", returned_objects=["last_object_clicked"]) 
-                else:
-                    st.error("Unable to create site-only map.")
+                with map_tabs[0]:
+                    if map_tabs[0].open:
+                        st.markdown("*Pink marker: Your proposed site*")
+                        only_map = get_map_html(
+                            (run_id, "site_only", show_traffic_single),
+                            functools.partial(create_sites_only_map, [site], show_traffic_single)
+                        )
+                        if only_map:
+                            st.iframe(only_map, width=700, height=500)
+                        else:
+                            st.error("Unable to create site-only map.")
             
-            with map_tabs[1]:
-                st.markdown("*Pink marker: Your proposed site | Red markers: Competitor EV stations*")
-                full_map = create_single_map(site, show_traffic_single)
-                st_folium(full_map, width=700, height=500, key="single_site_full_map", returned_objects=["last_object_clicked"]) 
+                with map_tabs[1]:
+                    if map_tabs[1].open:
+                        if not site.ev_stations_details.empty:
+                            st.markdown("*Pink marker: Your proposed site | Red markers: Competitor EV stations*")
+                            full_map = get_map_html(
+                                (run_id, "site_competitors", show_traffic_single),
+                                functools.partial(create_single_map, site, show_traffic_single)
+                            )
+                            st.iframe(full_map, width=700, height=500)
+                        else:
+                            st.info("No competitor EV charging stations found nearby.")
 
 # --- BATCH PROCESSING ---
 with tab2:
@@ -1014,11 +1411,10 @@ with tab2:
             
             if len(df) > 0:
                 st.write("**Sample Data (First 3 rows):**")
-                for i in range(min(3, len(df))):
-                    row_data = []
-                    for col in df.columns:
-                        row_data.append(f"{col}: {df.iloc[i][col]}")
-                    st.write(f"Row {i+1}: {' | '.join(row_data[:5])}")
+                preview = df.iloc[:3, :5]
+                for i, row in enumerate(preview.itertuples(index=False, name=None)):
+                    row_data = [f"{col}: {value}" for col, value in zip(preview.columns, row)]
+                    st.write(f"Row {i+1}: {' | '.join(row_data)}")
             
             required_cols = {"latitude", "longitude", "fast", "rapid", "ultra"}
             missing_cols = required_cols - set(df.columns)
@@ -1030,45 +1426,99 @@ with tab2:
                 st.success(f"✅ CSV file loaded successfully! Found {len(df)} sites to process.")
                 
                 if st.button("🚀 Process All Sites", type="primary"):
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    results = []
+                    n_sites = len(df)
+                    lats = pd.to_numeric(df["latitude"], errors="coerce").to_numpy(dtype=np.float64)
+                    lons = pd.to_numeric(df["longitude"], errors="coerce").to_numpy(dtype=np.float64)
+                    # Blank charger counts mean none of that type; anything else non-numeric
+                    # stays NaN so its row fails below instead of silently counting as 0
+                    charger_counts = {
+                        column: pd.to_numeric(df[column], errors="coerce").where(df[column].notna(), 0).to_numpy(dtype=np.float64)
+                        for column in ("fast", "rapid", "ultra")
+                    }
+                    results = [None] * n_sites
+                    update_every = max(1, n_sites // 100)
                     
-                    for i, row in df.iterrows():
-                        try:
-                            status_text.text(f"Processing site {i+1}/{len(df)}: ({row['latitude']}, {row['longitude']})")
-                            site = process_site(
-                                float(row["latitude"]), 
-                                float(row["longitude"]),
-                                int(row.get("fast", 0)), 
-                                int(row.get("rapid", 0)), 
-                                int(row.get("ultra", 0)),
-                                fast_kw, rapid_kw, ultra_kw
+                    with st.status(f"Processing {n_sites} sites...", expanded=False) as status:
+                        # Resolve roads and grid references up front, only for rows that
+                        # process_row will accept (usable coordinates and charger counts)
+                        invalid = np.isnan(lats) | np.isnan(lons)
+                        for counts in charger_counts.values():
+                            invalid |= np.isnan(counts)
+                        valid_rows = np.flatnonzero(~invalid)
+                        points = list(zip(lats[valid_rows].tolist(), lons[valid_rows].tolist()))
+                        # Repeated coordinates share one road lookup
+                        unique_points = tuple(dict.fromkeys(points))
+                        roads_by_point = dict(zip(unique_points, get_road_info_batch(unique_points)))
+                        road_infos = {i: roads_by_point[point] for i, point in zip(valid_rows.tolist(), points)}
+                        grids = dict(zip(
+                            valid_rows.tolist(),
+                            convert_batch_to_british_grid(lats[valid_rows], lons[valid_rows])
+                        ))
+                        
+                        def process_row(i):
+                            """Process one CSV row, rejecting rows without usable coordinates"""
+                            if np.isnan(lats[i]) or np.isnan(lons[i]):
+                                raise ValueError("missing or non-numeric coordinates")
+                            for column, counts in charger_counts.items():
+                                if np.isnan(counts[i]):
+                                    raise ValueError(f"non-numeric {column} charger count: {df[column].iat[i]!r}")
+                            return process_site(
+                                float(lats[i]), 
+                                float(lons[i]),
+                                int(charger_counts["fast"][i]), 
+                                int(charger_counts["rapid"][i]), 
+                                int(charger_counts["ultra"][i]),
+                                fast_kw, rapid_kw, ultra_kw,
+                                road_info=road_infos[i],
+                                grid=grids[i]
                             )
-                            results.append(site)
-                        except Exception as e:
-                            st.warning(f"Error processing row {i+1}: {e}")
-                            results.append({
-                                "latitude": row.get("latitude"),
-                                "longitude": row.get("longitude"),
-                                "error": str(e)
-                            })
                         
-                        progress_bar.progress((i + 1) / len(df))
-                    
-                    status_text.text("✅ Batch processing completed!")
+                        gc.disable()
+                        try:
+                            # Sites are I/O-bound, so several are processed at once; results
+                            # keep CSV order and progress is reported from this thread only
+                            with ThreadPoolExecutor(max_workers=BATCH_SITE_WORKERS, thread_name_prefix="batch") as pool:
+                                futures = {submit_with_context(pool, process_row, i): i for i in range(n_sites)}
+                                for done, future in enumerate(as_completed(futures), start=1):
+                                    i = futures[future]
+                                    try:
+                                        results[i] = future.result()
+                                    except Exception as e:
+                                        st.warning(f"Error processing row {i+1}: {e}")
+                                        # Failed rows keep the coordinates exactly as written in the CSV
+                                        results[i] = SiteResult(
+                                            latitude=df["latitude"].iat[i],
+                                            longitude=df["longitude"].iat[i],
+                                            error=str(e)
+                                        )
+                                    
+                                    if done % update_every == 0:
+                                        status.update(label=f"Processed {done}/{n_sites} sites...")
+                        finally:
+                            gc.collect()
+                            gc.enable()
+                        
+                        status.update(label="✅ Batch processing completed!", state="complete")
                     st.session_state["batch_results"] = results
+                    st.session_state["batch_ts"] = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
+                    st.session_state["batch_run_id"] = uuid.uuid4().hex
 
         except Exception as e:
             st.error(f"Error reading CSV file: {e}")
 
     if "batch_results" in st.session_state:
         results = st.session_state["batch_results"]
+        batch_ts = st.session_state["batch_ts"]
+        batch_run_id = st.session_state["batch_run_id"]
         
         st.subheader("📊 Batch Analysis Results")
         
-        successful_results = [r for r in results if "error" not in r]
-        failed_results = [r for r in results if "error" in r]
+        successful_results = [r for r in results if r.error is None]
+        failed_results = [r for r in results if r.error is not None]
+        
+        # Pull the numeric fields out once; every summary metric below is an array reduction
+        kva_values = np.array([r.required_kva for r in successful_results], dtype=np.float64)
+        competitor_counts = np.array([r.competitor_ev_count for r in successful_results], dtype=np.int64)
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -1078,13 +1528,13 @@ with tab2:
             st.metric("Successful", len(successful_results))
         with col3:
             if successful_results:
-                avg_kva = sum(r.get("required_kva", 0) for r in successful_results) / len(successful_results)
+                avg_kva = kva_values.mean()
                 st.metric("Avg kVA", f"{avg_kva:.1f}")
             else:
                 st.metric("Avg kVA", "N/A")
         with col4:
             if successful_results:
-                avg_competitors = sum(r.get("competitor_ev_count", 0) for r in successful_results) / len(successful_results)
+                avg_competitors = competitor_counts.mean()
                 st.metric("Avg Competitors", f"{avg_competitors:.1f}")
             else:
                 st.metric("Avg Competitors", "N/A")
@@ -1101,18 +1551,24 @@ with tab2:
                 with map_col1:
                     st.markdown("**Sites Only Map**")
                     st.markdown("*Pink markers: Your proposed EV sites*")
-                    sites_map = create_sites_only_map(successful_results, show_traffic_batch)
+                    sites_map = get_map_html(
+                        (batch_run_id, "sites_only", show_traffic_batch),
+                        functools.partial(create_sites_only_map, successful_results, show_traffic_batch)
+                    )
                     if sites_map:
-                        st_folium(sites_map, width=350, height=400, key="sites_only_map")
+                        st.iframe(sites_map, width=350, height=400)
                     else:
                         st.error("Unable to create sites map.")
                 
                 with map_col2:
                     st.markdown("**Sites + Competitors Map**")
                     st.markdown("*Pink markers: Your sites | Red markers: Competitors*")
-                    full_map = create_batch_map(successful_results, show_traffic=show_traffic_batch)
+                    full_map = get_map_html(
+                        (batch_run_id, "sites_competitors", show_traffic_batch),
+                        functools.partial(create_batch_map, successful_results, show_traffic=show_traffic_batch)
+                    )
                     if full_map:
-                        st_folium(full_map, width=350, height=400, key="full_batch_map")
+                        st.iframe(full_map, width=350, height=400)
                     else:
                         st.error("Unable to create full map.")
         
@@ -1121,158 +1577,150 @@ with tab2:
             if successful_results:
                 st.subheader("📋 Detailed Batch Analysis")
                 
-                batch_tabs = st.tabs(["🗺️ Sites Only", "🗺️ Sites + Competitors", "⚡ EV Competition"])
+                # Tracked tabs rerun on selection, so only the open view builds its map or tallies
+                batch_tabs = st.tabs(
+                    ["🗺️ Sites Only", "🗺️ Sites + Competitors", "⚡ EV Competition"],
+                    key="batch_view", on_change="rerun"
+                )
                 
                 with batch_tabs[0]:
-                    st.markdown("*Pink markers: Your proposed EV sites*")
-                    sites_map = create_sites_only_map(successful_results, show_traffic_batch)
-                    if sites_map:
-                        st_folium(sites_map, width=700, height=500, key="batch_sites_only")
-                    else:
-                        st.error("Unable to create sites map.")
+                    if batch_tabs[0].open:
+                        st.markdown("*Pink markers: Your proposed EV sites*")
+                        sites_map = get_map_html(
+                            (batch_run_id, "sites_only", show_traffic_batch),
+                            functools.partial(create_sites_only_map, successful_results, show_traffic_batch)
+                        )
+                        if sites_map:
+                            st.iframe(sites_map, width=700, height=500)
+                        else:
+                            st.error("Unable to create sites map.")
                 
                 with batch_tabs[1]:
-                    st.markdown("*Pink markers: Your proposed EV sites | Red markers: Competitor EV stations*")
-                    batch_map = create_batch_map(successful_results, show_traffic=show_traffic_batch)
-                    if batch_map:
-                        st_folium(batch_map, width=700, height=500, key="batch_full_map")
-                    else:
-                        st.error("Unable to create map.")
+                    if batch_tabs[1].open:
+                        st.markdown("*Pink markers: Your proposed EV sites | Red markers: Competitor EV stations*")
+                        batch_map = get_map_html(
+                            (batch_run_id, "sites_competitors", show_traffic_batch),
+                            functools.partial(create_batch_map, successful_results, show_traffic=show_traffic_batch)
+                        )
+                        if batch_map:
+                            st.iframe(batch_map, width=700, height=500)
+                        else:
+                            st.error("Unable to create map.")
                 
                 with batch_tabs[2]:
-                    st.write("**⚡ EV Competition Analysis**")
+                    if batch_tabs[2].open:
+                        st.write("**⚡ EV Competition Analysis**")
                     
-                    comp_col1, comp_col2, comp_col3 = st.columns(3)
+                        comp_col1, comp_col2, comp_col3 = st.columns(3)
                     
-                    total_competitors = sum(r.get("competitor_ev_count", 0) for r in successful_results)
-                    sites_with_competitors = sum(1 for r in successful_results if r.get("competitor_ev_count", 0) > 0)
-                    max_competitors_site = max(successful_results, key=lambda x: x.get("competitor_ev_count", 0))
-                    max_competitors = max_competitors_site.get("competitor_ev_count", 0)
+                        total_competitors = int(competitor_counts.sum())
+                        sites_with_competitors = int(np.count_nonzero(competitor_counts))
+                        max_competitors = int(competitor_counts.max())
                     
-                    with comp_col1:
-                        st.metric("Total Competitors Found", total_competitors)
-                    with comp_col2:
-                        st.metric("Sites with Competitors", sites_with_competitors)
-                    with comp_col3:
-                        st.metric("Max Competitors (Single Site)", max_competitors)
+                        with comp_col1:
+                            st.metric("Total Competitors Found", total_competitors)
+                        with comp_col2:
+                            st.metric("Sites with Competitors", sites_with_competitors)
+                        with comp_col3:
+                            st.metric("Max Competitors (Single Site)", max_competitors)
                     
-                    if total_competitors > 0:
-                        st.write("**📊 Overall Market Share Analysis**")
+                        if total_competitors > 0:
+                            st.write("**📊 Overall Market Share Analysis**")
                         
-                        all_competitors = {}
-                        for result in successful_results:
-                            ev_stations = result.get('ev_stations_details', [])
-                            if isinstance(ev_stations, list):
-                                for station in ev_stations:
-                                    if isinstance(station, dict):
-                                        name = station.get('name', 'Unknown')
-                                        brand = extract_brand_name(name)
-                                        all_competitors[brand] = all_competitors.get(brand, 0) + 1
+                            # Cached on the station names, so reruns from unrelated widgets skip the recount
+                            brand_counts = compute_market_share(tuple(pd.concat(
+                                [r.ev_stations_details['name'] for r in successful_results],
+                                ignore_index=True
+                            )))
+                            all_competitors = brand_counts.to_dict()
                         
-                        if all_competitors:
-                            total_stations = sum(all_competitors.values())
-                            st.write("**Market Share Distribution:**")
-                            for brand, count in all_competitors.items():
-                                percentage = (count / total_stations) * 100
-                                st.write(f"**{brand}**: {count} stations ({percentage:.1f}%)")
-                                st.progress(percentage / 100)
+                            if all_competitors:
+                                counts = brand_counts.to_numpy()
+                                percentages = counts / counts.sum() * 100
+                                st.write("**Market Share Distribution:**")
+                                for brand, count, percentage in zip(brand_counts.index, counts.tolist(), percentages.tolist()):
+                                    st.write(f"**{brand}**: {count} stations ({percentage:.1f}%)")
+                                    st.progress(percentage / 100)
                             
-                            st.write("**Visual Breakdown:**")
-                            try:
-                                pie_chart_img = create_pie_chart_data(all_competitors)
-                                if pie_chart_img:
-                                    st.markdown(f'<img src="data:image/png;base64,{pie_chart_img}" style="width:100%">', unsafe_allow_html=True)
-                                else:
-                                    df_market = pd.DataFrame({
-                                        'Brand': list(all_competitors.keys()),
-                                        'Total Stations': list(all_competitors.values())
-                                    }).sort_values('Total Stations', ascending=False)
+                                st.write("**Visual Breakdown:**")
+                                try:
+                                    pie_chart_img = create_pie_chart_data(all_competitors)
+                                    if pie_chart_img:
+                                        st.markdown(f'<img src="data:image/png;base64,{pie_chart_img}" style="width:100%">', unsafe_allow_html=True)
+                                    else:
+                                        df_market = brand_counts.rename_axis('Brand').reset_index(name='Total Stations')
+                                        st.bar_chart(df_market.set_index('Brand'), use_container_width=True)
+                                except Exception as e:
+                                    st.warning(f"Could not create pie chart: {e}")
+                                    df_market = brand_counts.rename_axis('Brand').reset_index(name='Total Stations')
                                     st.bar_chart(df_market.set_index('Brand'), use_container_width=True)
-                            except Exception as e:
-                                st.warning(f"Could not create pie chart: {e}")
-                                df_market = pd.DataFrame({
-                                    'Brand': list(all_competitors.keys()),
-                                    'Total Stations': list(all_competitors.values())
-                                }).sort_values('Total Stations', ascending=False)
-                                st.bar_chart(df_market.set_index('Brand'), use_container_width=True)
         
         if failed_results:
             st.subheader("⚠️ Failed Sites")
             for i, failed in enumerate(failed_results):
-                st.write(f"**Site {i+1}:** {failed.get('latitude', 'N/A')}, {failed.get('longitude', 'N/A')} - {failed.get('error', 'Unknown error')}")
+                st.write(f"**Site {i+1}:** {failed.latitude}, {failed.longitude} - {failed.error}")
         
         if successful_results:
             st.subheader("📥 Download Results")
             
-            download_data = []
-            for i, site in enumerate(successful_results):
-                try:
-                    download_data.append({
-                        'Site_Number': i + 1,
-                        'Latitude': site.get('latitude', ''),
-                        'Longitude': site.get('longitude', ''),
-                        'Address': str(site.get('formatted_address', '')),
-                        'Postcode': str(site.get('postcode', '')),
-                        'Ward': str(site.get('ward', '')),
-                        'District': str(site.get('district', '')),
-                        'Fast_Chargers': int(site.get('fast_chargers', 0)),
-                        'Rapid_Chargers': int(site.get('rapid_chargers', 0)),
-                        'Ultra_Chargers': int(site.get('ultra_chargers', 0)),
-                        'Required_kVA': float(site.get('required_kva', 0)),
-                        'Snapped_Road_Name': str(site.get('snapped_road_name', '')),
-                        'Snapped_Road_Type': str(site.get('snapped_road_type', '')),
-                        'Traffic_Congestion': str(site.get('traffic_congestion', '')),
-                        'Traffic_Speed_mph': str(site.get('traffic_speed', '')),
-                        'Competitor_EV_Count': int(site.get('competitor_ev_count', 0)),
-                        'Competitor_EV_Names': str(site.get('competitor_ev_names', '')),
-                        'Amenities': str(site.get('amenities', '')),
-                        'British_Grid_Easting': str(site.get('easting', '')),
-                        'British_Grid_Northing': str(site.get('northing', ''))
-                    })
-                except Exception as e:
-                    st.warning(f"Error preparing site {i+1} for download: {e}")
-                    download_data.append({
-                        'Site_Number': i + 1,
-                        'Latitude': site.get('latitude', ''),
-                        'Longitude': site.get('longitude', ''),
-                        'Address': 'Error processing data',
-                        'Error': str(e)
-                    })
+            # CSV column -> (SiteResult attribute, conversion), in export order
+            export_columns = {
+                'Latitude': ('latitude', float),
+                'Longitude': ('longitude', float),
+                'Address': ('formatted_address', str),
+                'Postcode': ('postcode', str),
+                'Ward': ('ward', str),
+                'District': ('district', str),
+                'Fast_Chargers': ('fast_chargers', int),
+                'Rapid_Chargers': ('rapid_chargers', int),
+                'Ultra_Chargers': ('ultra_chargers', int),
+                'Required_kVA': ('required_kva', float),
+                'Snapped_Road_Name': ('snapped_road_name', str),
+                'Snapped_Road_Type': ('snapped_road_type', str),
+                'Traffic_Congestion': ('traffic_congestion', str),
+                'Traffic_Speed_mph': ('traffic_speed', str),
+                'Competitor_EV_Count': ('competitor_ev_count', int),
+                'Competitor_EV_Names': ('competitor_ev_names', str),
+                'Amenities': ('amenities', str),
+                'British_Grid_Easting': ('easting', str),
+                'British_Grid_Northing': ('northing', str)
+            }
             
             try:
-                df_download = pd.DataFrame(download_data)
+                # Build the export column by column rather than as a list of per-site dicts
+                df_download = pd.DataFrame({
+                    column: [convert(getattr(site, attr)) for site in successful_results]
+                    for column, (attr, convert) in export_columns.items()
+                })
+                df_download.insert(0, 'Site_Number', np.arange(1, len(df_download) + 1))
                 csv_data = df_download.to_csv(index=False)
                 
-                st.write(f"**Download includes {len(download_data)} sites with {len(df_download.columns)} data columns**")
+                st.write(f"**Download includes {len(df_download)} sites with {len(df_download.columns)} data columns**")
                 
                 st.download_button(
                     label="📥 Download Complete Analysis CSV",
                     data=csv_data,
-                    file_name=f"ev_site_batch_analysis_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    file_name=f"ev_site_batch_analysis_{batch_ts}.csv",
                     mime="text/csv",
                     key="download_csv_batch"
                 )
                 
-                simplified_data = []
-                for i, site in enumerate(successful_results):
-                    simplified_data.append({
-                        'Site': i + 1,
-                        'Lat': site.get('latitude', ''),
-                        'Lon': site.get('longitude', ''),
-                        'Address': str(site.get('formatted_address', ''))[:100],
-                        'kVA': site.get('required_kva', 0),
-                        'Road_Type': str(site.get('snapped_road_type', '')),
-                        'Traffic': str(site.get('traffic_congestion', '')),
-                        'Competitors': site.get('competitor_ev_count', 0)
-                    })
-                
-                df_simple = pd.DataFrame(simplified_data)
+                df_simple = pd.DataFrame({
+                    'Site': df_download['Site_Number'],
+                    'Lat': df_download['Latitude'],
+                    'Lon': df_download['Longitude'],
+                    'Address': df_download['Address'].str[:100],
+                    'kVA': df_download['Required_kVA'],
+                    'Road_Type': df_download['Snapped_Road_Type'],
+                    'Traffic': df_download['Traffic_Congestion'],
+                    'Competitors': df_download['Competitor_EV_Count']
+                })
                 csv_simple = df_simple.to_csv(index=False)
                 
                 st.download_button(
                     label="📥 Download Summary CSV (Essential Data Only)",
                     data=csv_simple,
-                    file_name=f"ev_site_summary_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    file_name=f"ev_site_summary_{batch_ts}.csv",
                     mime="text/csv",
                     key="download_simple_batch"
                 )